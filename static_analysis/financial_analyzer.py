@@ -3,7 +3,8 @@
 Financial Metrics Analyzer for Banks
 
 This program analyzes financial metrics for a given bank (by RSSD ID) and identifies
-remarkable changes in the latest quarter compared to historical trends.
+remarkable changes in the latest quarter compared to historical trends. It can also
+screen all banks at once and run the full analysis only for the most remarkable ones.
 """
 
 import argparse
@@ -28,6 +29,13 @@ warnings.filterwarnings('ignore')
 class FinancialAnalyzer:
     """Analyzes financial metrics for banks using DuckDB/Parquet data."""
     
+    # Deviation (in standard deviations) above which a metric change is remarkable
+    Z_SCORE_THRESHOLD = 2.0
+    # Screening: cap on per-series z-scores, so a near-flat history can't dominate
+    SCREEN_Z_CAP = 10.0
+    # Screening: minimum number of earlier changes a series needs to be scored
+    SCREEN_MIN_HISTORY = 3
+    
     def __init__(self, db_path: str = None):
         """Initialize the analyzer with database connection."""
         # Default to the standard database location if no path provided
@@ -155,7 +163,7 @@ class FinancialAnalyzer:
         # Criterion 1: Large deviation from trend (>2 standard deviations)
         if historical_std > 0:
             z_score = deviation / historical_std
-            if z_score > 2.0:
+            if z_score > self.Z_SCORE_THRESHOLD:
                 is_remarkable = True
                 confidence = min(z_score / 4.0, 1.0)  # Scale confidence
         
@@ -255,6 +263,122 @@ class FinancialAnalyzer:
             "unremarkable_changes": unremarkable_changes
         }
 
+    def get_latest_change_stats(self) -> pd.DataFrame:
+        """
+        Get latest-change statistics for every metric series of every bank in one query.
+        
+        Returns:
+            DataFrame with one row per (rssd_id, metric, duration) holding the latest
+            percentage change and the mean/std of the preceding percentage changes
+        """
+        query = """
+        WITH observations AS (
+            SELECT 
+                rssd_id,
+                property_name,
+                qa_field_id,
+                field_type,
+                duration,
+                period_date,
+                ANY_VALUE(numeric_value) AS numeric_value,
+                COUNT(DISTINCT numeric_value) <= 1 AS is_consistent
+            FROM (
+                SELECT 
+                    *,
+                    TRY_CAST(REPLACE(REPLACE(value, ',', ''), '$', '') AS DOUBLE) AS numeric_value
+                FROM financial_metrics 
+                WHERE value IS NOT NULL 
+                AND value != ''
+            )
+            -- financial_metrics holds exact copies of some rows (same key, period and
+            -- value); keep one. Series where copies disagree are dropped below.
+            GROUP BY rssd_id, property_name, qa_field_id, field_type, duration, period_date
+        ),
+        changes AS (
+            SELECT 
+                rssd_id,
+                property_name,
+                qa_field_id,
+                field_type,
+                duration,
+                is_consistent,
+                (numeric_value - LAG(numeric_value) OVER w)
+                    / NULLIF(LAG(numeric_value) OVER w, 0) * 100 AS pct_change,
+                ROW_NUMBER() OVER (
+                    PARTITION BY rssd_id, property_name, qa_field_id, field_type, duration
+                    ORDER BY period_date DESC
+                ) AS recency
+            FROM observations
+            WHERE numeric_value IS NOT NULL
+            WINDOW w AS (
+                PARTITION BY rssd_id, property_name, qa_field_id, field_type, duration
+                ORDER BY period_date
+            )
+        )
+        SELECT 
+            rssd_id,
+            property_name,
+            qa_field_id,
+            field_type,
+            duration,
+            MAX(pct_change) FILTER (WHERE recency = 1) AS latest_change,
+            AVG(pct_change) FILTER (WHERE recency > 1) AS historical_mean,
+            STDDEV_POP(pct_change) FILTER (WHERE recency > 1) AS historical_std
+        FROM changes
+        GROUP BY rssd_id, property_name, qa_field_id, field_type, duration
+        HAVING COUNT(pct_change) FILTER (WHERE recency > 1) >= ?
+        AND BOOL_AND(is_consistent)
+        """
+        return self.conn.execute(query, [self.SCREEN_MIN_HISTORY]).df()
+    
+    def screen_all_banks(self) -> pd.DataFrame:
+        """
+        Rank all banks by how remarkable their latest quarter looks.
+        
+        This is a cheap approximation of analyze_metric_trend: each series gets a
+        z-score of its latest change against the mean/std of its earlier changes
+        (capped at SCREEN_Z_CAP), rather than against a regression extrapolation, and
+        trend reversals and acceleration are not checked. A bank's score is the mean,
+        over its scorable series, of the amount by which each z-score exceeds
+        Z_SCORE_THRESHOLD, so it doesn't grow with the number of metrics reported.
+        Series with a flat history or an undefined latest change (previous value 0)
+        are left out of the mean.
+        
+        Because the score is a mean, a single outlier among many stable metrics
+        scores low and can fall under a min-score cutoff; max_z_score is reported
+        alongside it and breaks ties, and top-N selection is the way to catch them.
+        
+        Returns:
+            DataFrame with one row per bank, sorted by descending score
+        """
+        series = self.get_latest_change_stats()
+        
+        latest = series['latest_change'].to_numpy(dtype=float)
+        mean = series['historical_mean'].to_numpy(dtype=float)
+        std = series['historical_std'].to_numpy(dtype=float)
+        
+        # Series with a flat history or an undefined latest change can't be scored
+        with np.errstate(divide='ignore', invalid='ignore'):
+            z_scores = np.abs(latest - mean) / std
+        z_scores = np.where(np.isfinite(z_scores), z_scores, np.nan)
+        z_scores = np.minimum(z_scores, self.SCREEN_Z_CAP)
+        
+        series['z_score'] = z_scores
+        series['flagged'] = z_scores > self.Z_SCORE_THRESHOLD
+        series['excess_z_score'] = np.maximum(z_scores - self.Z_SCORE_THRESHOLD, 0.0)
+        
+        banks = series.groupby('rssd_id').agg(
+            score=('excess_z_score', 'mean'),
+            flagged_series=('flagged', 'sum'),
+            max_z_score=('z_score', 'max'),
+            total_series=('z_score', 'size'),
+        ).reset_index()
+        banks['rssd_id'] = banks['rssd_id'].astype(str)
+        banks['score'] = banks['score'].fillna(0.0)
+        
+        return banks.sort_values(['score', 'max_z_score', 'rssd_id'],
+                                 ascending=[False, False, True], ignore_index=True)
+
 
 class ReportGenerator:
     """Generates HTML reports using LLM analysis."""
@@ -307,20 +431,138 @@ def get_openrouter_key() -> Optional[str]:
         return None
 
 
+def select_banks_for_analysis(screen: pd.DataFrame, min_score: Optional[float] = None,
+                              top_n: Optional[int] = None) -> List[str]:
+    """
+    Pick the screened banks worth a full analysis: those above min_score, plus the top-N.
+    
+    Returns:
+        RSSD IDs of the selected banks, in descending score order
+    """
+    ranked = screen.sort_values(['score', 'max_z_score', 'rssd_id'], ascending=[False, False, True])
+    selected = pd.Series(False, index=ranked.index)
+    if min_score is not None:
+        selected |= ranked['score'] > min_score
+    if top_n is not None:
+        selected.iloc[:top_n] = True
+    return ranked.loc[selected, 'rssd_id'].tolist()
+
+
+def extract_ticker(bank_name: str) -> str:
+    """Extract ticker from a bank name like "CMA (RSSD 1199844)", else return the name."""
+    if "(" in bank_name and bank_name.endswith(")"):
+        return bank_name.split("(")[0].strip()
+    return bank_name
+
+
+def write_report(analysis_result: Dict[str, Any], report_generator: ReportGenerator,
+                 output_root: str) -> None:
+    """Generate the HTML report for one bank and save it with its prompt and data."""
+    ticker = extract_ticker(analysis_result.get("name", ""))
+    html_report = report_generator.generate_report(analysis_result, ticker)
+    
+    # Save report and prompt
+    output_dir = Path(output_root) / analysis_result["rssd_id"]
+    output_dir.mkdir(parents=True, exist_ok=True)
+    report_path = output_dir / "report.htm"
+    prompt_path = output_dir / "prompt.txt"
+    
+    # Save the HTML report
+    with open(report_path, 'w', encoding='utf-8') as f:
+        f.write(html_report)
+    
+    # Save the prompt instructions (without JSON data)
+    prompt_template = report_generator._create_prompt_template(ticker)
+    prompt_instructions = prompt_template.replace("{financial_data}", "[See prompt.json for the complete financial data]")
+    
+    # Save the financial data as JSON
+    json_path = output_dir / "prompt.json"
+    
+    with open(prompt_path, 'w', encoding='utf-8') as f:
+        f.write(prompt_instructions)
+        
+    with open(json_path, 'w', encoding='utf-8') as f:
+        json.dump(analysis_result, f, indent=2)
+    
+    print(f"Report saved to: {report_path}")
+    print(f"Prompt saved to: {prompt_path}")
+    print(f"Financial data saved to: {json_path}")
+
+
+def require_openrouter_key() -> str:
+    """Return the OpenRouter API key, exiting if none is configured."""
+    openrouter_key = get_openrouter_key()
+    if not openrouter_key:
+        print("\nerror: no OpenRouter API key found in $HOME/.or. Skipping HTML report generation.")
+        print("To generate HTML reports, create a file at $HOME/.or with your OpenRouter API key.")
+        sys.exit(1)
+    return openrouter_key
+
+
+def run_screen(analyzer: FinancialAnalyzer, args: argparse.Namespace) -> None:
+    """Screen every bank, then run the full analysis and report only for the selected ones."""
+    print("Screening latest-quarter changes for all banks...")
+    screen = analyzer.screen_all_banks()
+    selected = select_banks_for_analysis(screen, args.min_score, args.top_n)
+    
+    print(f"\n{len(selected)} of {len(screen)} banks selected for full analysis")
+    if selected:
+        print(screen[screen['rssd_id'].isin(selected)].to_string(
+            index=False, float_format=lambda v: f"{v:.2f}"))
+    
+    if not selected:
+        return
+    
+    report_generator = ReportGenerator(require_openrouter_key())
+    failures = 0
+    for rssd_id in selected:
+        try:
+            print(f"\nAnalyzing financial metrics for RSSD ID: {rssd_id}")
+            analysis_result = analyzer.analyze_all_metrics(rssd_id)
+            print("Generating HTML report...")
+            write_report(analysis_result, report_generator, args.output_dir)
+        except Exception as e:
+            # One bad bank shouldn't stop the rest of the batch
+            print(f"Error: RSSD ID {rssd_id}: {e}", file=sys.stderr)
+            failures += 1
+    
+    if failures:
+        sys.exit(1)
+
+
 def main():
     """Main function to run the financial analysis."""
-    parser = argparse.ArgumentParser(description='Analyze financial metrics for a bank by RSSD ID')
-    parser.add_argument('rssd_id', type=str, help='RSSD ID of the bank to analyze')
+    parser = argparse.ArgumentParser(
+        description='Analyze financial metrics for a bank by RSSD ID, or screen all banks '
+                    'and analyze only the most remarkable ones')
+    parser.add_argument('rssd_id', type=str, nargs='?', help='RSSD ID of the bank to analyze')
     parser.add_argument('--db-path', type=str, help='Path to DuckDB database file')
     parser.add_argument('--output-dir', type=str, default='/Users/x/dp/git/a/public/firms_by_rssd_id',
                        help='Output directory for reports')
+    parser.add_argument('--screen', action='store_true',
+                       help='Screen all banks and fully analyze only the remarkable ones')
+    parser.add_argument('--min-score', type=float,
+                       help='With --screen, analyze banks whose screening score (mean excess '
+                            'z-score; may miss single-metric outliers) exceeds this')
+    parser.add_argument('--top-n', type=int,
+                       help='With --screen, also analyze the N highest-scoring banks')
     
     args = parser.parse_args()
+    if not args.screen and not args.rssd_id:
+        parser.error("an RSSD ID is required unless --screen is given")
+    if args.screen and args.min_score is None and args.top_n is None:
+        parser.error("--screen requires --min-score and/or --top-n")
+    if args.top_n is not None and args.top_n < 1:
+        parser.error("--top-n must be at least 1")
     
     try:
         # Initialize analyzer
         analyzer = FinancialAnalyzer(args.db_path)
         
+        if args.screen:
+            run_screen(analyzer, args)
+            return
+        
         # Perform analysis
         print(f"Analyzing financial metrics for RSSD ID: {args.rssd_id}")
         analysis_result = analyzer.analyze_all_metrics(args.rssd_id)
@@ -329,52 +571,10 @@ def main():
         print("\nAnalysis Result:")
         print(json.dumps(analysis_result, indent=2))
         
-        # Try to get OpenRouter API key and generate HTML report
-        openrouter_key = get_openrouter_key()
-        if openrouter_key:
-            print("\nGenerating HTML report...")
-            
-            # Extract ticker from bank name for report generation
-            bank_name = analysis_result.get("name", "")
-            if "(" in bank_name and bank_name.endswith(")"):
-                # Extract ticker from format like "CMA (RSSD 1199844)"
-                ticker = bank_name.split("(")[0].strip()
-            else:
-                ticker = bank_name
-            
-            report_generator = ReportGenerator(openrouter_key)
-            html_report = report_generator.generate_report(analysis_result, ticker)
-            
-            # Save report and prompt
-            output_dir = Path(args.output_dir) / args.rssd_id
-            output_dir.mkdir(parents=True, exist_ok=True)
-            report_path = output_dir / "report.htm"
-            prompt_path = output_dir / "prompt.txt"
-            
-            # Save the HTML report
-            with open(report_path, 'w', encoding='utf-8') as f:
-                f.write(html_report)
-            
-            # Save the prompt instructions (without JSON data)
-            prompt_template = report_generator._create_prompt_template(ticker)
-            prompt_instructions = prompt_template.replace("{financial_data}", "[See prompt.json for the complete financial data]")
-            
-            # Save the financial data as JSON
-            json_path = output_dir / "prompt.json"
-            
-            with open(prompt_path, 'w', encoding='utf-8') as f:
-                f.write(prompt_instructions)
-                
-            with open(json_path, 'w', encoding='utf-8') as f:
-                json.dump(analysis_result, f, indent=2)
-            
-            print(f"Report saved to: {report_path}")
-            print(f"Prompt saved to: {prompt_path}")
-            print(f"Financial data saved to: {json_path}")
-        else:
-            print("\nerror: no OpenRouter API key found in $HOME/.or. Skipping HTML report generation.")
-            print("To generate HTML reports, create a file at $HOME/.or with your OpenRouter API key.")
-            sys.exit(1)
+        # Generate HTML report (requires an OpenRouter API key)
+        report_generator = ReportGenerator(require_openrouter_key())
+        print("\nGenerating HTML report...")
+        write_report(analysis_result, report_generator, args.output_dir)
     
     except Exception as e:
         print(f"Error: {e}", file=sys.stderr)
@@ -26,6 +26,12 @@ while [ -n "$1" ]; do
                         done < $t.0
                         exit 0
                 ;;
+                -screen)
+                        shift
+                        cd $script_dir
+                        python3 financial_analyzer.py --screen "$@"
+                        exit
+                ;;
                 -dry)
                         dry_mode=-dry
                 ;;
@@ -0,0 +1,145 @@
+"""Tests for the screening pass in financial_analyzer."""
+
+import sys
+
+import pandas as pd
+import pytest
+
+from financial_analyzer import FinancialAnalyzer, main, select_banks_for_analysis
+
+
+QUARTERS = ['2024-03-31', '2024-06-30', '2024-09-30', '2024-12-31', '2025-03-31', '2025-06-30']
+STABLE = ['100', '101', '100', '101', '100', '100.5']
+
+
+@pytest.fixture
+def analyzer():
+    """Analyzer over an in-memory financial_metrics table."""
+    analyzer = FinancialAnalyzer(':memory:')
+    analyzer.conn.execute("""
+    CREATE TABLE financial_metrics (
+        rssd_id BIGINT, property_name TEXT, qa_field_id TEXT,
+        field_type TEXT, period_date DATE, duration TEXT, value TEXT
+    )
+    """)
+    return analyzer
+
+
+def add_series(analyzer, rssd_id, property_name, values, duration='MRQ'):
+    """Insert one metric series, one value per quarter."""
+    for period_date, value in zip(QUARTERS, values):
+        analyzer.conn.execute(
+            "INSERT INTO financial_metrics VALUES (?, ?, ?, 'v', ?, ?, ?)",
+            [rssd_id, property_name, property_name, period_date, duration, value])
+
+
+def test_screen_ranks_remarkable_bank_first(analyzer):
+    add_series(analyzer, 1, 'Assets', STABLE)
+    add_series(analyzer, 2, 'Assets', ['100', '101', '100', '101', '100', '200'])
+    screen = analyzer.screen_all_banks()
+    assert screen['rssd_id'].tolist() == ['2', '1']
+    assert screen.loc[1, 'score'] == 0.0
+    assert screen.loc[0, 'flagged_series'] == 1
+
+
+def test_screen_caps_z_score_and_normalizes_by_series_count(analyzer):
+    # Near-flat history: the raw z-score would be enormous
+    add_series(analyzer, 1, 'Assets', ['100', '110', '121', '133.1', '146.41', '500'])
+    add_series(analyzer, 1, 'Loans', STABLE)
+    screen = analyzer.screen_all_banks()
+    assert screen.loc[0, 'max_z_score'] == FinancialAnalyzer.SCREEN_Z_CAP
+    expected = (FinancialAnalyzer.SCREEN_Z_CAP - FinancialAnalyzer.Z_SCORE_THRESHOLD) / 2
+    assert screen.loc[0, 'score'] == pytest.approx(expected)
+
+
+def test_screen_handles_flat_history_and_zero_previous_value(analyzer):
+    add_series(analyzer, 1, 'Flat', ['5', '5', '5', '5', '5', '9'])
+    add_series(analyzer, 1, 'FromZero', ['1', '2', '3', '4', '0', '7'])
+    screen = analyzer.screen_all_banks()
+    assert screen.loc[0, 'score'] == 0.0
+    assert screen.loc[0, 'flagged_series'] == 0
+    assert screen.loc[0, 'total_series'] == 2
+
+
+def test_screen_leaves_unscorable_series_out_of_score(analyzer):
+    add_series(analyzer, 1, 'Assets', ['100', '101', '100', '101', '100', '200'])
+    add_series(analyzer, 1, 'Flat', ['5', '5', '5', '5', '5', '9'])
+    add_series(analyzer, 2, 'Assets', ['100', '101', '100', '101', '100', '200'])
+    screen = analyzer.screen_all_banks()
+    assert screen.loc[0, 'score'] == pytest.approx(screen.loc[1, 'score'])
+    assert screen['rssd_id'].tolist() == ['1', '2']
+
+
+def test_screen_ignores_duplicate_rows(analyzer):
+    values = ['100', '101', '102', '103', '104', '105']
+    add_series(analyzer, 1, 'Assets', values)
+    add_series(analyzer, 1, 'Assets', values)
+    stats = analyzer.get_latest_change_stats()
+    assert len(stats) == 1
+    assert stats.loc[0, 'latest_change'] == pytest.approx(100 / 104)
+    # Duplicates must not add spurious 0% changes to the history
+    assert stats.loc[0, 'historical_mean'] == pytest.approx(
+        sum(100 / v for v in [100, 101, 102, 103]) / 4)
+
+
+def test_screen_keeps_durations_apart(analyzer):
+    add_series(analyzer, 1, 'Assets', STABLE, duration='MRQ')
+    add_series(analyzer, 1, 'Assets', ['400', '404', '400', '404', '400', '800'], duration='LTM')
+    stats = analyzer.get_latest_change_stats().set_index('duration')
+    assert stats.loc['MRQ', 'latest_change'] == pytest.approx(0.5)
+    assert stats.loc['LTM', 'latest_change'] == pytest.approx(100.0)
+
+
+def test_screen_drops_series_with_conflicting_copies(analyzer):
+    add_series(analyzer, 1, 'Assets', STABLE)
+    add_series(analyzer, 1, 'Assets', ['100', '101', '100', '101', '100', '300'])
+    assert analyzer.get_latest_change_stats().empty
+
+
+def test_screen_skips_short_histories(analyzer):
+    add_series(analyzer, 1, 'Assets', ['100', '101', '102', '500'])
+    assert analyzer.get_latest_change_stats().empty
+
+
+@pytest.fixture
+def screen():
+    """Unsorted screen result with a non-default index."""
+    return pd.DataFrame({
+        'rssd_id': ['10', '20', '30', '40'],
+        'score': [0.0, 0.9, 0.1, 0.5],
+        'max_z_score': [1.0, 10.0, 3.0, 6.0],
+    }, index=[7, 3, 5, 1])
+
+
+def test_select_by_min_score(screen):
+    assert select_banks_for_analysis(screen, min_score=0.2) == ['20', '40']
+
+
+def test_select_by_top_n(screen):
+    assert select_banks_for_analysis(screen, top_n=3) == ['20', '40', '30']
+
+
+def test_select_by_min_score_or_top_n(screen):
+    assert select_banks_for_analysis(screen, min_score=0.05, top_n=1) == ['20', '40', '30']
+    assert select_banks_for_analysis(screen, min_score=0.8, top_n=2) == ['20', '40']
+
+
+def test_select_nothing_without_criteria(screen):
+    assert select_banks_for_analysis(screen) == []
+
+
+def test_select_breaks_ties_by_rssd_id():
+    tied = pd.DataFrame({
+        'rssd_id': ['30', '10', '20'],
+        'score': [0.5, 0.5, 0.5],
+        'max_z_score': [4.0, 4.0, 4.0],
+    })
+    assert select_banks_for_analysis(tied, top_n=2) == ['10', '20']
+
+
+@pytest.mark.parametrize('top_n', ['0', '-1'])
+def test_main_rejects_non_positive_top_n(monkeypatch, top_n):
+    monkeypatch.setattr(sys, 'argv', ['financial_analyzer.py', '--screen', '--top-n', top_n])
+    with pytest.raises(SystemExit) as excinfo:
+        main()
+    assert excinfo.value.code == 2